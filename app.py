@@ -1,16 +1,83 @@
 import os
+import re
+import json
 import logging
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, session
-from utils.spotify_browser import SpotifyBrowser
-from utils.transcription_extractor import extract_transcription
-import urllib.parse
+from flask import Flask, Response, render_template, request, jsonify, flash, redirect, url_for, session, stream_with_context
+from flask_compress import Compress
+from flask_session import Session
+from utils.async_runner import run_async
+from utils.browser_pool import BrowserPool, credential_key
+from utils.credential_store import CredentialStore
+from utils.jobs import enqueue_extraction, fetch_job
+from utils.redis_client import get_redis
+from utils.transcript_cache import TranscriptCache
+from utils.transcription_extractor import extract_batch_with_pool, extract_with_pool, login_with_pool
 
 # Create Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "spotify-transcription-app-secret")
 
-# Global variable to store browser instance
-spotify_browser = None
+# Transcripts are large, repetitive text: compress responses with brotli or gzip
+app.config.update(
+    COMPRESS_ALGORITHM=['br', 'gzip'],
+    COMPRESS_MIN_SIZE=1024,
+)
+Compress(app)
+
+# Keep session data in Redis when it's configured, so the cookie only carries
+# a random session id. Without Redis the default signed-cookie session is used.
+redis_client = get_redis()
+if redis_client is not None:
+    app.config.update(
+        SESSION_TYPE='redis',
+        SESSION_REDIS=redis_client,
+    )
+    Session(app)
+
+# Passwords are stored encrypted on the server; the session holds a reference
+credential_store = CredentialStore(redis_client)
+
+# Extracted transcripts, keyed by episode id; pass force=1 to bypass
+transcript_cache = TranscriptCache(redis_client)
+
+# Warm browsers and logged-in contexts shared by all requests. The pool lives
+# on the background event loop, so every call into it goes through run_async().
+browser_pool = BrowserPool(size=int(os.environ.get("BROWSER_POOL_SIZE", "4")))
+
+# Limits for /api/transcription/batch, kept low to avoid Spotify rate limiting
+MAX_BATCH_SIZE = 20
+MAX_BATCH_CONCURRENCY = 5
+
+# Characters of transcript encoded per chunk of a streamed API response
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Spotify episode page URL; group 1 is the episode id used as the cache key
+EPISODE_URL_RE = re.compile(r'https://open\.spotify\.com/episode/([A-Za-z0-9]{22})(?:\?.*)?')
+
+
+def _session_password():
+    """Return the Spotify password for the logged-in session user, if any."""
+    return credential_store.load(session.get('spotify_credentials'))
+
+
+def _clear_session_credentials():
+    """Forget the Spotify credentials held for the current session."""
+    credential_store.delete(session.pop('spotify_credentials', None))
+    session.pop('spotify_username', None)
+
+
+def _stream_transcription_json(episode_url, transcription):
+    """Yield the /api/transcription success body piece by piece.
+
+    Encoding the transcript in chunks avoids building a second, fully
+    escaped copy of it in memory the way jsonify() does.
+    """
+    yield '{"success": true, "episode_url": ' + json.dumps(episode_url) + ', "transcription": "'
+    for start in range(0, len(transcription), STREAM_CHUNK_SIZE):
+        # Strip the quotes json.dumps() adds around each chunk
+        yield json.dumps(transcription[start:start + STREAM_CHUNK_SIZE])[1:-1]
+    yield '"}'
+
 
 @app.route('/')
 def index():
@@ -27,20 +94,14 @@ def login():
         flash('Please provide both username and password', 'danger')
         return redirect(url_for('index'))
     
-    # Store credentials in session for later use
+    # Store credentials for later use; the password stays on the server
+    _clear_session_credentials()
     session['spotify_username'] = username
-    session['spotify_password'] = password
+    session['spotify_credentials'] = credential_store.store(password)
     
     # Try to log in to Spotify
     try:
-        global spotify_browser
-        # Close existing browser if one exists
-        if spotify_browser:
-            spotify_browser.close()
-            
-        # Create new browser instance and login
-        spotify_browser = SpotifyBrowser()
-        success = spotify_browser.login(username, password)
+        success = run_async(login_with_pool(browser_pool, username, password))
         
         if success:
             flash('Successfully logged in to Spotify', 'success')
@@ -48,8 +109,7 @@ def login():
         else:
             flash('Failed to log in to Spotify. Please check your credentials.', 'danger')
             # Clear session credentials on failure
-            session.pop('spotify_username', None)
-            session.pop('spotify_password', None)
+            _clear_session_credentials()
             return redirect(url_for('index'))
             
     except Exception as e:
@@ -67,28 +127,48 @@ def extract():
         return redirect(url_for('index'))
     
     # Validate URL is from Spotify
-    parsed_url = urllib.parse.urlparse(episode_url)
-    if not (parsed_url.netloc == 'open.spotify.com' and 'episode' in parsed_url.path):
+    match = EPISODE_URL_RE.fullmatch(episode_url)
+    if not match:
         flash('Please provide a valid Spotify episode URL (e.g., https://open.spotify.com/episode/...)', 'danger')
         return redirect(url_for('index'))
     
     # Check if user is logged in
-    if 'spotify_username' not in session or 'spotify_password' not in session:
+    password = _session_password()
+    if 'spotify_username' not in session or not password:
         flash('Please log in to Spotify first', 'danger')
         return redirect(url_for('index'))
     
+    episode_id = match.group(1)
+    force = request.values.get('force') == '1'
+    
     try:
-        global spotify_browser
-        # If browser not initialized or closed, create a new one and login
-        if not spotify_browser or not spotify_browser.is_active():
-            spotify_browser = SpotifyBrowser()
-            success = spotify_browser.login(session['spotify_username'], session['spotify_password'])
-            if not success:
-                flash('Failed to log in to Spotify. Please try logging in again.', 'danger')
-                return redirect(url_for('index'))
+        transcription = None if force else transcript_cache.get(episode_id)
         
-        # Extract transcription
-        transcription = extract_transcription(spotify_browser, episode_url)
+        if not transcription:
+            # Hand the extraction to a background worker when a queue is configured;
+            # the page then polls /status/<job_id> instead of holding this request open
+            job = enqueue_extraction(
+                session['spotify_username'], session['spotify_credentials'], episode_url, episode_id, force
+            )
+            if job is not None:
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify({'job_id': job.id})
+                return render_template('index.html', job_id=job.id, episode_url=episode_url)
+            
+            # Concurrent requests for the same episode wait for one extraction
+            with transcript_cache.single_flight(episode_id) as leader:
+                if not leader:
+                    transcription = transcript_cache.get(episode_id)
+                if not transcription:
+                    # Extract transcription, logging in again if the pooled context lost its session
+                    success, transcription = run_async(
+                        extract_with_pool(browser_pool, session['spotify_username'], password, episode_url, episode_id, force)
+                    )
+                    if not success:
+                        flash('Failed to log in to Spotify. Please try logging in again.', 'danger')
+                        return redirect(url_for('index'))
+                    if transcription:
+                        transcript_cache.set(episode_id, transcription)
         
         if transcription:
             return render_template('index.html', transcription=transcription, episode_url=episode_url)
@@ -101,20 +181,49 @@ def extract():
         flash(f'Error during transcription extraction: {str(e)}', 'danger')
         return redirect(url_for('index'))
 
+@app.route('/status/<job_id>')
+def job_status(job_id):
+    """Report the progress of a background extraction started by /extract."""
+    job = fetch_job(job_id)
+    if job is None or job.meta.get('username') != session.get('spotify_username'):
+        return jsonify({'error': 'Job not found'}), 404
+    
+    status = job.get_status()
+    status = getattr(status, 'value', status)
+    response = {'job_id': job.id, 'status': status}
+    
+    if status == 'finished':
+        transcription = job.return_value()
+        if transcription:
+            response['transcription'] = transcription
+        else:
+            response['error'] = 'No transcription found for this episode'
+    elif status == 'failed':
+        # Show the message of the exception raised by the job
+        last_line = (job.exc_info or '').strip().splitlines()[-1:] or ['']
+        response['error'] = last_line[0].split(': ', 1)[-1] or 'Error during transcription extraction'
+    elif status in ('stopped', 'canceled'):
+        response['error'] = 'Transcription extraction was stopped before it finished'
+    
+    return jsonify(response)
+
 @app.route('/logout', methods=['POST'])
 def logout():
-    """Log out from Spotify and close browser."""
-    global spotify_browser
-    if spotify_browser:
+    """Log out from Spotify and close the user's pooled browser contexts."""
+    password = _session_password()
+    if 'spotify_username' in session and password:
         try:
-            spotify_browser.close()
+            run_async(browser_pool.discard(credential_key(session['spotify_username'], password)))
         except Exception as e:
             logging.error(f"Error closing browser: {str(e)}")
-        spotify_browser = None
     
-    # Clear session data
-    session.pop('spotify_username', None)
-    session.pop('spotify_password', None)
+    # Clear session data. With server-side sessions, the stored session is
+    # deleted and a new id issued first, while the session still has data (an
+    # empty one isn't regenerated), so the flash below doesn't reuse the old id.
+    if redis_client is not None:
+        app.session_interface.regenerate(session)
+    _clear_session_credentials()
+    session.clear()
     
     flash('Logged out successfully', 'success')
     return redirect(url_for('index'))
@@ -132,36 +241,45 @@ def api_transcription():
     password = data.get('password')
     
     # Validate URL
-    parsed_url = urllib.parse.urlparse(episode_url)
-    if not (parsed_url.netloc == 'open.spotify.com' and 'episode' in parsed_url.path):
+    match = EPISODE_URL_RE.fullmatch(episode_url) if isinstance(episode_url, str) else None
+    if not match:
         return jsonify({'error': 'Invalid Spotify episode URL'}), 400
     
     # Check credentials
     if not username or not password:
         return jsonify({'error': 'Missing Spotify credentials'}), 400
     
+    episode_id = match.group(1)
+    force = request.args.get('force') == '1'
+    
     try:
-        # Create a new browser instance for API requests to avoid conflicts
-        api_browser = SpotifyBrowser(headless=True)  # Use headless mode for API
-        
-        # Login
-        login_success = api_browser.login(username, password)
-        if not login_success:
-            api_browser.close()
+        # Check the credentials before serving anything, cached or not; with a
+        # warm or restored context this doesn't go through the login form
+        if not run_async(login_with_pool(browser_pool, username, password)):
             return jsonify({'error': 'Failed to login to Spotify'}), 401
         
-        # Extract transcription
-        transcription = extract_transcription(api_browser, episode_url)
+        transcription = None if force else transcript_cache.get(episode_id)
         
-        # Close browser
-        api_browser.close()
+        if not transcription:
+            # Concurrent requests for the same episode wait for one extraction
+            with transcript_cache.single_flight(episode_id) as leader:
+                if not leader:
+                    transcription = transcript_cache.get(episode_id)
+                if not transcription:
+                    # Borrow a warm context from the pool; repeat callers skip the login
+                    login_success, transcription = run_async(
+                        extract_with_pool(browser_pool, username, password, episode_url, episode_id, force)
+                    )
+                    if not login_success:
+                        return jsonify({'error': 'Failed to login to Spotify'}), 401
+                    if transcription:
+                        transcript_cache.set(episode_id, transcription)
         
         if transcription:
-            return jsonify({
-                'success': True,
-                'episode_url': episode_url,
-                'transcription': transcription
-            })
+            return Response(
+                stream_with_context(_stream_transcription_json(episode_url, transcription)),
+                mimetype='application/json'
+            )
         else:
             return jsonify({
                 'success': False,
@@ -172,6 +290,80 @@ def api_transcription():
         logging.error(f"API extraction error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/transcription/batch', methods=['POST'])
+def api_transcription_batch():
+    """API endpoint to get transcriptions for several Spotify episodes at once."""
+    data = request.json
+    
+    if not isinstance(data, dict) or not isinstance(data.get('episode_urls'), list) or not data['episode_urls']:
+        return jsonify({'error': 'Missing episode_urls parameter'}), 400
+    if not all(isinstance(url, str) for url in data['episode_urls']):
+        return jsonify({'error': 'episode_urls must be a list of strings'}), 400
+    
+    episode_urls = list(dict.fromkeys(data['episode_urls']))
+    username = data.get('username')
+    password = data.get('password')
+    
+    if len(episode_urls) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} episode URLs per batch'}), 400
+    
+    # Validate URLs, keeping each episode id for the cache
+    episode_ids = {}
+    invalid_urls = []
+    for url in episode_urls:
+        match = EPISODE_URL_RE.fullmatch(url)
+        if match:
+            episode_ids[url] = match.group(1)
+        else:
+            invalid_urls.append(url)
+    if invalid_urls:
+        return jsonify({'error': 'Invalid Spotify episode URL', 'invalid_urls': invalid_urls}), 400
+    
+    # Check credentials
+    if not username or not password:
+        return jsonify({'error': 'Missing Spotify credentials'}), 400
+    
+    force = request.args.get('force') == '1'
+    
+    try:
+        # Check the credentials before serving anything, cached or not
+        if not run_async(login_with_pool(browser_pool, username, password)):
+            return jsonify({'error': 'Failed to login to Spotify'}), 401
+        
+        results = {}
+        pending = {}
+        for url in episode_urls:
+            transcription = None if force else transcript_cache.get(episode_ids[url])
+            if transcription:
+                results[url] = {'transcription': transcription}
+            else:
+                pending[url] = episode_ids[url]
+        
+        if pending:
+            login_success, extracted = run_async(
+                extract_batch_with_pool(browser_pool, username, password, pending, MAX_BATCH_CONCURRENCY, force)
+            )
+            if not login_success:
+                return jsonify({'error': 'Failed to login to Spotify'}), 401
+            
+            for url, transcription in extracted.items():
+                if isinstance(transcription, Exception):
+                    results[url] = {'error': str(transcription)}
+                elif transcription:
+                    transcript_cache.set(episode_ids[url], transcription)
+                    results[url] = {'transcription': transcription}
+                else:
+                    results[url] = {'error': 'No transcription found for this episode'}
+        
+        return jsonify({
+            'success': any('transcription' in result for result in results.values()),
+            'results': {url: results[url] for url in episode_urls}
+        })
+            
+    except Exception as e:
+        logging.error(f"API batch extraction error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.errorhandler(404)
 def not_found(e):
     return render_template('index.html', error="Page not found"), 404
@@ -129,3 +129,76 @@ function validateSpotifyUrl(input) {
         }
     }
 }
+
+/**
+ * Poll a background extraction job until it finishes
+ */
+document.addEventListener('DOMContentLoaded', function() {
+    const jobStatus = document.getElementById('jobStatus');
+    
+    if (jobStatus) {
+        pollJobStatus(jobStatus);
+    }
+});
+
+// Consecutive failed status requests before polling gives up
+const MAX_POLL_FAILURES = 5;
+
+function pollJobStatus(jobStatus, failures = 0) {
+    fetch(jobStatus.dataset.statusUrl, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(data => {
+            if (data.transcription) {
+                showTranscription(jobStatus, data.transcription);
+            } else if (data.error) {
+                showJobError(jobStatus, data.error);
+            } else {
+                setTimeout(() => pollJobStatus(jobStatus), 2000);
+            }
+        })
+        .catch(() => {
+            if (failures + 1 >= MAX_POLL_FAILURES) {
+                showJobError(jobStatus, 'Could not check the transcription status. Please try again.');
+            } else {
+                setTimeout(() => pollJobStatus(jobStatus, failures + 1), 5000);
+            }
+        });
+}
+
+/**
+ * Render a finished transcription in place of the job spinner
+ */
+function showTranscription(jobStatus, transcription) {
+    const header = document.createElement('div');
+    header.className = 'mb-2';
+    header.innerHTML = `
+        <div class="d-flex justify-content-between align-items-center">
+            <span class="text-success">
+                <i class="fas fa-check-circle me-1"></i>
+                Transcription extracted successfully
+            </span>
+            <button class="btn btn-sm btn-outline-light" id="copyBtn" onclick="copyTranscription()">
+                <i class="fas fa-copy me-1"></i>
+                Copy
+            </button>
+        </div>`;
+    
+    const content = document.createElement('div');
+    content.className = 'bg-dark p-3 rounded transcription-box';
+    content.id = 'transcriptionContent';
+    content.innerText = transcription;
+    
+    jobStatus.replaceWith(header, content);
+}
+
+/**
+ * Show why a background extraction failed
+ */
+function showJobError(jobStatus, message) {
+    const alert = document.createElement('div');
+    alert.className = 'alert alert-warning mb-0';
+    alert.setAttribute('role', 'alert');
+    alert.textContent = message;
+    
+    jobStatus.replaceWith(alert);
+}
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+import threading
+
+# Single event loop shared by every Flask worker thread in this process.
+# Playwright's async objects are bound to the loop that created them, so all
+# browser work is submitted here instead of spinning up a loop per request.
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop():
+    """Return the background event loop, starting it on first use.
+
+    Returns:
+        asyncio.AbstractEventLoop: The loop running in the background thread
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="browser-event-loop", daemon=True)
+            thread.start()
+            logging.debug("Started background event loop for browser automation")
+    return _loop
+
+
+def run_async(coro, timeout=None):
+    """Run a coroutine on the background loop and block until it finishes.
+
+    Args:
+        coro: The coroutine to execute
+        timeout (float): Maximum number of seconds to wait for the result
+
+    Returns:
+        The value returned by the coroutine
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    return future.result(timeout)
@@ -0,0 +1,473 @@
+import asyncio
+import atexit
+import contextlib
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import shutil
+import stat
+import tempfile
+import time
+from collections import namedtuple
+
+# Import Playwright but handle import errors gracefully
+try:
+    from playwright.async_api import async_playwright
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+    PLAYWRIGHT_AVAILABLE = True
+except ImportError:
+    PlaywrightTimeoutError = TimeoutError
+    PLAYWRIGHT_AVAILABLE = False
+
+# Cookie Spotify sets once a web player login has gone through
+SPOTIFY_AUTH_COOKIE = 'sp_dc'
+
+# Saved logins older than this are ignored so the session gets refreshed
+STORAGE_STATE_MAX_AGE = 24 * 60 * 60
+
+# Chromium features a text scraper doesn't need
+CHROMIUM_ARGS = [
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-extensions',
+    '--no-sandbox',
+    '--disable-background-networking',
+    '--disable-renderer-backgrounding',
+    '--disable-features=TranslateUI,BlinkGenPropertyTrees',
+]
+
+# Browser engine to launch and, for a system install, the binary to use
+BrowserChoice = namedtuple('BrowserChoice', ['engine', 'executable_path'])
+
+
+def _probe_binaries():
+    """Pick the browser to launch once, at import time.
+
+    ``PLAYWRIGHT_BROWSER`` selects the engine (chromium, firefox or webkit).
+    For Chromium a system binary on the PATH is preferred; otherwise
+    Playwright's own downloaded build is used.
+
+    Returns:
+        BrowserChoice: The engine name and executable path (or None)
+    """
+    engine = os.environ.get("PLAYWRIGHT_BROWSER", "chromium")
+    if engine not in ('chromium', 'firefox', 'webkit'):
+        logging.warning(f"Unknown PLAYWRIGHT_BROWSER {engine!r}, using chromium")
+        engine = 'chromium'
+    if engine == 'chromium':
+        for name in ('chromium', 'chromium-browser'):
+            path = shutil.which(name)
+            if path:
+                return BrowserChoice(engine, path)
+    return BrowserChoice(engine, None)
+
+
+BROWSER_CHOICE = _probe_binaries()
+
+# Requests that don't affect the transcript DOM and are aborted by every context
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font', 'stylesheet'})
+
+# Playwright runtime shared by every pool in the process. Starting it spawns
+# the Node driver, so it is started once and only stopped at interpreter exit.
+_playwright = None
+_playwright_loop = None
+_playwright_lock = asyncio.Lock()
+
+
+async def get_playwright():
+    """Return the process-wide Playwright runtime, starting it on first use.
+
+    Returns:
+        The started Playwright instance
+    """
+    global _playwright, _playwright_loop
+    async with _playwright_lock:
+        if _playwright is None:
+            _playwright = await async_playwright().start()
+            _playwright_loop = asyncio.get_running_loop()
+            atexit.register(_stop_playwright)
+            logging.debug("Started Playwright runtime")
+    return _playwright
+
+
+def _stop_playwright():
+    """Stop the shared Playwright runtime on its own event loop at exit."""
+    global _playwright
+    if _playwright is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_playwright.stop(), _playwright_loop).result(timeout=5)
+    except Exception as e:
+        logging.error(f"Error stopping Playwright: {str(e)}")
+    _playwright = None
+
+
+# Secret the credential keys are derived with. Without a configured one, a
+# per-process secret is used, so saved logins don't outlive the process.
+_KEY_SECRET = (os.environ.get("CREDENTIALS_KEY") or os.environ.get("SESSION_SECRET") or secrets.token_hex(32)).encode('utf-8')
+
+# Private directory for saved logins, which hold live Spotify cookies
+STORAGE_STATE_DIR = os.path.join(tempfile.gettempdir(), f"spotify-transcriber-{os.getuid()}")
+
+
+def credential_key(username, password):
+    """Build the pool key for a set of Spotify credentials.
+
+    Contexts are keyed by username *and* password so that a warm, logged-in
+    context is never handed to a caller who only knows the username. The key
+    is an HMAC under a server secret, so a key seen in a file name can't be
+    used to guess the password offline.
+
+    Args:
+        username (str): Spotify username or email
+        password (str): Spotify password
+
+    Returns:
+        str: Opaque key identifying the credentials
+    """
+    return hmac.new(_KEY_SECRET, f"{username}\0{password}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def _storage_state_dir():
+    """Create the saved login directory, readable only by this user.
+
+    Returns:
+        str: Path of the directory
+    """
+    os.makedirs(STORAGE_STATE_DIR, mode=0o700, exist_ok=True)
+    st = os.lstat(STORAGE_STATE_DIR)
+    if st.st_uid != os.getuid() or not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f"{STORAGE_STATE_DIR} is not a directory owned by this user")
+    if st.st_mode & 0o077:
+        os.chmod(STORAGE_STATE_DIR, 0o700)
+    return STORAGE_STATE_DIR
+
+
+def storage_state_path(key):
+    """Return where the saved login (cookies + localStorage) for a key lives.
+
+    Args:
+        key (str): Pool key from ``credential_key()``
+
+    Returns:
+        str: Path of the storage state JSON file
+    """
+    return os.path.join(STORAGE_STATE_DIR, f"spot_{key}.json")
+
+
+def write_storage_state(path, state):
+    """Save a login as a storage state file only this user can read.
+
+    The file is written under a temporary name and then renamed, so a
+    context restored concurrently never sees a half-written file.
+
+    Args:
+        path (str): Path from ``storage_state_path()``
+        state (dict): Storage state, as returned by ``BrowserContext.storage_state()``
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=_storage_state_dir(), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def storage_state_is_fresh(path):
+    """Check whether a saved login file exists and is recent enough to use.
+
+    Args:
+        path (str): Path of the storage state file
+
+    Returns:
+        bool: True if the file exists and is younger than ``STORAGE_STATE_MAX_AGE``
+    """
+    try:
+        return time.time() - os.path.getmtime(path) < STORAGE_STATE_MAX_AGE
+    except OSError:
+        return False
+
+
+def fresh_storage_state(key):
+    """Return the saved login for a key if it exists and is recent enough.
+
+    Args:
+        key (str): Pool key from ``credential_key()``
+
+    Returns:
+        str: Path of the storage state file, or None if missing or stale
+    """
+    path = storage_state_path(key)
+    return path if storage_state_is_fresh(path) else None
+
+
+async def _block_heavy_resources(route):
+    """Route handler that aborts images, media, fonts and stylesheets."""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def is_authenticated(context):
+    """Check whether a browser context already holds a Spotify login.
+
+    Args:
+        context: Playwright BrowserContext to inspect
+
+    Returns:
+        bool: True if the Spotify auth cookie is present
+    """
+    cookies = await context.cookies('https://open.spotify.com')
+    return any(cookie['name'] == SPOTIFY_AUTH_COOKIE for cookie in cookies)
+
+
+class BrowserPool:
+    """Keeps warm browser processes and hands out logged-in contexts.
+
+    New contexts are opened on an already running browser; another process
+    is only launched, up to ``size``, once every browser carries
+    ``contexts_per_browser`` contexts. Contexts are returned to the pool
+    after use and reused for the same credentials, so repeat requests skip
+    both the browser launch and the Spotify login. A browser that has served
+    ``max_uses_per_browser`` checkouts is retired and closed once its
+    contexts are returned, which bounds memory growth in long-lived processes.
+    """
+
+    def __init__(self, size=4, headless=True, max_idle_per_key=2, contexts_per_browser=8,
+                 max_uses_per_browser=50):
+        """Initialize an empty pool.
+
+        Args:
+            size (int): Maximum number of browser processes to keep running.
+            headless (bool): Whether to run the browsers in headless mode.
+            max_idle_per_key (int): Idle contexts kept per set of credentials.
+            contexts_per_browser (int): Contexts a browser takes before
+                another process is launched.
+            max_uses_per_browser (int): Checkouts a browser serves before
+                it is replaced by a fresh one.
+        """
+        self.size = size
+        self.headless = headless
+        self.max_idle_per_key = max_idle_per_key
+        self.contexts_per_browser = contexts_per_browser
+        self.max_uses_per_browser = max_uses_per_browser
+        self.playwright = None
+        self._browsers = []
+        self._retired = []
+        self._uses = {}
+        self._owned = set()
+        self._idle = {}
+        self._lock = asyncio.Lock()
+
+    async def _spawn(self):
+        """Launch a new browser process with Playwright.
+
+        When ``BROWSERLESS_WS`` is set (e.g.
+        ``wss://chrome.browserless.io?token=...&keepalive=60000``), connect
+        to that remote Chromium over CDP instead of launching one locally.
+
+        Returns:
+            The launched Playwright Browser
+        """
+        if self.playwright is None:
+            self.playwright = await get_playwright()
+
+        ws_endpoint = os.environ.get("BROWSERLESS_WS")
+        if ws_endpoint:
+            browser = await self.playwright.chromium.connect_over_cdp(ws_endpoint)
+            logging.debug("Connected to remote Chromium over CDP")
+            return browser
+
+        engine = getattr(self.playwright, BROWSER_CHOICE.engine)
+        launch_options = {'headless': self.headless}
+        if BROWSER_CHOICE.executable_path:
+            launch_options['executable_path'] = BROWSER_CHOICE.executable_path
+        if BROWSER_CHOICE.engine == 'chromium':
+            launch_options['args'] = CHROMIUM_ARGS
+
+        browser = await engine.launch(**launch_options)
+        logging.debug(f"Browser initialized successfully with {BROWSER_CHOICE.engine} "
+                      f"({BROWSER_CHOICE.executable_path or 'Playwright build'})")
+        return browser
+
+    async def _get_browser(self):
+        """Return the least busy running browser, launching one only if all are busy.
+
+        Returns:
+            A connected Playwright Browser
+        """
+        async with self._lock:
+            self._browsers = [browser for browser in self._browsers if browser.is_connected()]
+            self._retired = [browser for browser in self._retired if browser.is_connected()]
+            browser = min(self._browsers, key=lambda b: len(b.contexts), default=None)
+
+            if browser is None or (len(browser.contexts) >= self.contexts_per_browser
+                                   and len(self._browsers) < self.size):
+                browser = await self._spawn()
+                self._browsers.append(browser)
+            return browser
+
+    async def _record_use(self, context):
+        """Count a checkout against the context's browser, retiring it when used up.
+
+        Idle contexts of a retired browser are closed right away, whichever
+        credentials they belong to, so only contexts still in use keep the
+        process alive.
+        """
+        browser = context.browser
+        self._uses[browser] = self._uses.get(browser, 0) + 1
+        if self._uses[browser] >= self.max_uses_per_browser and browser in self._browsers:
+            logging.debug(f"Retiring browser after {self._uses[browser]} uses")
+            self._browsers.remove(browser)
+            self._retired.append(browser)
+
+            # Take the contexts out of every idle list before awaiting, so a
+            # concurrent checkin() or discard() can't change the lists mid-sweep
+            stale = []
+            for key in list(self._idle):
+                contexts = self._idle[key]
+                stale.extend(c for c in contexts if c.browser is browser)
+                contexts[:] = [c for c in contexts if c.browser is not browser]
+            for idle_context in stale:
+                await self._close_context(idle_context)
+
+    async def _close_context(self, context):
+        """Close a pooled context, and its browser if that was retired and is now unused."""
+        browser = context.browser
+        self._owned.discard(context)
+        await context.close()
+
+        if browser in self._retired and not any(c in self._owned for c in browser.contexts):
+            self._retired.remove(browser)
+            self._uses.pop(browser, None)
+            await browser.close()
+            logging.debug("Closed retired browser")
+
+    async def _pop_idle(self, key):
+        """Take an idle context for the given key, or an unused one.
+
+        Generic contexts are skipped when a saved login exists for the key,
+        since a new context restored from it is already logged in.
+        """
+        idle_keys = (key,) if fresh_storage_state(key) else (key, None)
+        for idle_key in idle_keys:
+            contexts = self._idle.get(idle_key, [])
+            while contexts:
+                context = contexts.pop()
+                if context.browser in self._retired:
+                    await self._close_context(context)
+                elif context.browser and context.browser.is_connected():
+                    return context
+                else:
+                    self._owned.discard(context)
+        return None
+
+    @contextlib.asynccontextmanager
+    async def checkout(self, key):
+        """Borrow a browser context for the given credentials.
+
+        The context is logged in already if it was used with the same key
+        before or a fresh saved login exists for it; callers should check
+        ``is_authenticated()`` and log in if not.
+
+        Args:
+            key (str): Pool key from ``credential_key()``
+
+        Yields:
+            A Playwright BrowserContext, or None if no browser can be launched
+        """
+        context = await self._pop_idle(key)
+        if context is None and PLAYWRIGHT_AVAILABLE:
+            try:
+                browser = await self._get_browser()
+                # Service workers would fetch outside the route filter below
+                context = await browser.new_context(
+                    storage_state=fresh_storage_state(key),
+                    java_script_enabled=True,
+                    bypass_csp=True,
+                    service_workers='block',
+                )
+                self._owned.add(context)
+                await context.route('**/*', _block_heavy_resources)
+            except Exception as e:
+                logging.error(f"Browser initialization failed: {str(e)}")
+                logging.info("Falling back to request-based mode")
+
+        if context is None:
+            yield None
+            return
+
+        try:
+            await self._record_use(context)
+            yield context
+        except BaseException:
+            await self._close_context(context)
+            raise
+        await self.checkin(key, context)
+
+    async def checkin(self, key, context):
+        """Return a context to the pool after use.
+
+        Logged-in contexts are kept under their credentials. Anything else is
+        wiped and kept as a generic warm context for the next caller.
+
+        Args:
+            key (str): Pool key the context was checked out with
+            context: The Playwright BrowserContext being returned
+        """
+        try:
+            if context.browser in self._retired:
+                await self._close_context(context)
+                return
+
+            if not await is_authenticated(context):
+                await context.clear_cookies()
+                key = None
+
+            contexts = self._idle.setdefault(key, [])
+            if len(contexts) >= self.max_idle_per_key:
+                await self._close_context(context)
+            else:
+                contexts.append(context)
+        except Exception as e:
+            logging.error(f"Error returning browser context to pool: {str(e)}")
+
+    async def discard(self, key):
+        """Close every idle context held for the given credentials.
+
+        Args:
+            key (str): Pool key from ``credential_key()``
+        """
+        for context in self._idle.pop(key, []):
+            try:
+                await self._close_context(context)
+            except Exception as e:
+                logging.error(f"Error closing browser context: {str(e)}")
+
+    async def close(self):
+        """Close all contexts and browsers.
+
+        The shared Playwright runtime keeps running for other pools and is
+        stopped when the process exits.
+        """
+        try:
+            for key in list(self._idle):
+                await self.discard(key)
+            for browser in self._browsers + self._retired:
+                await browser.close()
+
+            self._browsers = []
+            self._retired = []
+            self._uses = {}
+            self._owned = set()
+            self.playwright = None
+
+            logging.debug("Browser pool closed successfully")
+        except Exception as e:
+            logging.error(f"Error closing browser pool: {str(e)}")
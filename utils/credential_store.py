@@ -0,0 +1,104 @@
+import base64
+import hashlib
+import logging
+import os
+import secrets
+
+from cryptography.fernet import Fernet, InvalidToken
+
+# How long stored credentials outlive the last login, in seconds
+CREDENTIAL_TTL = 7 * 24 * 60 * 60
+
+
+# Random key used when no secret is configured, shared by every store in the process
+_random_key = None
+
+
+def _fernet_key():
+    """Return the Fernet key from ``CREDENTIALS_KEY`` or derive one from the session secret.
+
+    Without either, a random per-process key is used, so stored credentials
+    can't be read by other processes such as RQ workers.
+    """
+    global _random_key
+    key = os.environ.get("CREDENTIALS_KEY")
+    if key:
+        return key.encode('utf-8')
+    secret = os.environ.get("SESSION_SECRET")
+    if secret:
+        return base64.urlsafe_b64encode(hashlib.sha256(secret.encode('utf-8')).digest())
+    if _random_key is None:
+        logging.warning("Neither CREDENTIALS_KEY nor SESSION_SECRET is set; using a random credentials key")
+        _random_key = Fernet.generate_key()
+    return _random_key
+
+
+class CredentialStore:
+    """Keeps Spotify passwords encrypted on the server, out of the session cookie.
+
+    The session only holds an opaque reference. Blobs go to Redis when a
+    client is given, otherwise to process memory.
+    """
+
+    def __init__(self, redis_client=None):
+        """Initialize the store.
+
+        Args:
+            redis_client: Redis client to store blobs in, or None for memory.
+        """
+        self.redis = redis_client
+        self._fernet = Fernet(_fernet_key())
+        self._memory = {}
+
+    def store(self, password):
+        """Encrypt and store a password.
+
+        Args:
+            password (str): The Spotify password
+
+        Returns:
+            str: Reference to keep in the session
+        """
+        ref = secrets.token_urlsafe(24)
+        blob = self._fernet.encrypt(password.encode('utf-8'))
+        if self.redis is not None:
+            self.redis.setex(f"credentials:{ref}", CREDENTIAL_TTL, blob)
+        else:
+            self._memory[ref] = blob
+        return ref
+
+    def load(self, ref):
+        """Look up and decrypt a stored password.
+
+        Args:
+            ref (str): Reference returned by ``store()``
+
+        Returns:
+            str: The password, or None if it expired or can't be decrypted
+        """
+        if not ref:
+            return None
+        if self.redis is not None:
+            blob = self.redis.get(f"credentials:{ref}")
+        else:
+            blob = self._memory.get(ref)
+        if blob is None:
+            return None
+        try:
+            return self._fernet.decrypt(blob).decode('utf-8')
+        except InvalidToken:
+            logging.error("Stored credentials could not be decrypted")
+            return None
+
+    def delete(self, ref):
+        """Remove a stored password.
+
+        Args:
+            ref (str): Reference returned by ``store()``
+        """
+        if not ref:
+            return
+        if self.redis is not None:
+            self.redis.delete(f"credentials:{ref}")
+        else:
+            self._memory.pop(ref, None)
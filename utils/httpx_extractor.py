@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import time
+
+
+# Import httpx but handle import errors gracefully
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    logging.warning("httpx not available, transcripts will always be fetched with the browser")
+    HTTPX_AVAILABLE = False
+
+# Prefer orjson for the transcript responses, which can be several MB
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# Web player endpoints the browser itself calls to load a transcript
+ACCESS_TOKEN_URL = 'https://open.spotify.com/get_access_token?reason=transport&productType=web_player'
+TRANSCRIPT_URL = 'https://spclient.wg.spotify.com/transcript-read-along/v2/episode/{episode_id}?format=json&excludeCC=true'
+
+# Cookies that carry the web player login
+AUTH_COOKIES = ('sp_dc', 'sp_key')
+
+# Access tokens kept at most, across all users
+MAX_ACCESS_TOKENS = 256
+
+_client = None
+_access_tokens = {}
+
+
+def _get_client():
+    """Return the shared HTTP/2 client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=10.0,
+            limits=httpx.Limits(max_keepalive_connections=8),
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                'Accept': 'application/json',
+                'Accept-Language': 'en-US,en;q=0.9',
+                'App-Platform': 'WebPlayer',
+            },
+        )
+    return _client
+
+
+async def _get_access_token(client, cookie_header):
+    """Exchange the login cookies for a web player access token.
+
+    Tokens are cached until shortly before they expire, keyed by a hash of
+    the cookies so the cookies themselves aren't kept around.
+    """
+    cache_key = hashlib.sha256(cookie_header.encode('utf-8')).hexdigest()
+    cached = _access_tokens.get(cache_key)
+    if cached and cached[1] > time.time() + 60:
+        return cached[0]
+
+    response = await client.get(ACCESS_TOKEN_URL, headers={'Cookie': cookie_header})
+    if response.status_code != 200:
+        logging.debug(f"Access token request failed: {response.status_code}")
+        return None
+
+    data = _json.loads(response.content)
+    token = data.get('accessToken')
+    if not token or data.get('isAnonymous'):
+        return None
+
+    expires_at = data.get('accessTokenExpirationTimestampMs', 0) / 1000
+    _remember_access_token(cache_key, token, expires_at)
+    return token
+
+
+def _remember_access_token(cache_key, token, expires_at):
+    """Cache a token, dropping expired ones and the soonest to expire beyond the limit."""
+    now = time.time()
+    for key in [key for key, (_, expiry) in _access_tokens.items() if expiry <= now]:
+        del _access_tokens[key]
+    _access_tokens[cache_key] = (token, expires_at)
+    while len(_access_tokens) > MAX_ACCESS_TOKENS:
+        del _access_tokens[min(_access_tokens, key=lambda key: _access_tokens[key][1])]
+
+
+def _parse_transcript(data):
+    """Join the sentences of a transcript-read-along response."""
+    lines = []
+    for section in data.get('section', []):
+        sentence = section.get('text', {}).get('sentence', {}).get('text')
+        if sentence and sentence.strip():
+            lines.append(sentence.strip())
+    return "\n\n".join(lines) if lines else None
+
+
+async def try_httpx(episode_id, cookies):
+    """Fetch a transcript with plain HTTP requests instead of the browser.
+
+    Args:
+        episode_id (str): Spotify episode id
+        cookies (dict): Spotify cookies by name, from a logged-in context
+
+    Returns:
+        str: The transcription text, or None if this fast path can't get it
+    """
+    if not HTTPX_AVAILABLE:
+        return None
+
+    cookie_header = '; '.join(f"{name}={cookies[name]}" for name in AUTH_COOKIES if cookies.get(name))
+    if not cookie_header:
+        return None
+
+    try:
+        client = _get_client()
+        token = await _get_access_token(client, cookie_header)
+        if not token:
+            return None
+
+        url = TRANSCRIPT_URL.format(episode_id=episode_id)
+        response = await client.get(url, headers={'Authorization': f'Bearer {token}'})
+        if response.status_code != 200:
+            logging.debug(f"Transcript request failed: {response.status_code}")
+            return None
+
+        transcription = _parse_transcript(_json.loads(response.content))
+        if transcription:
+            logging.debug(f"Fetched transcription over HTTP for episode: {episode_id}")
+        return transcription
+
+    except Exception as e:
+        logging.warning(f"HTTP transcript fetch failed, falling back to browser: {str(e)}")
+        return None
@@ -0,0 +1,117 @@
+# Background extraction jobs run by an RQ worker. Start a worker that keeps
+# its browser pool between jobs with:
+#
+#     rq worker --url "$REDIS_URL" --worker-class rq.worker.SimpleWorker transcriptions
+#
+# The default forking worker works too, but launches a fresh browser per job.
+import logging
+import os
+
+from utils.async_runner import run_async
+from utils.browser_pool import BrowserPool
+from utils.credential_store import CredentialStore
+from utils.redis_client import get_redis
+from utils.transcript_cache import TranscriptCache
+from utils.transcription_extractor import extract_with_pool
+
+# Import RQ but handle import errors gracefully
+try:
+    from rq import Queue
+    RQ_AVAILABLE = True
+except ImportError:
+    logging.warning("rq not available, extractions will run inside web requests")
+    RQ_AVAILABLE = False
+
+QUEUE_NAME = 'transcriptions'
+
+# Seconds a job may run, and how long its result stays available for polling
+JOB_TIMEOUT = 300
+RESULT_TTL = 600
+
+# Browser pool owned by the worker process, created on the first job
+_worker_pool = None
+
+
+def get_queue():
+    """Return the extraction queue.
+
+    Returns:
+        rq.Queue: The queue, or None if RQ or Redis isn't available
+    """
+    redis_client = get_redis()
+    if not RQ_AVAILABLE or redis_client is None:
+        return None
+    return Queue(QUEUE_NAME, connection=redis_client)
+
+
+def enqueue_extraction(username, credentials_ref, episode_url, episode_id, force=False):
+    """Queue a transcription extraction for the given session user.
+
+    Only the credential reference is put on the queue, never the password.
+
+    Args:
+        username (str): Spotify username or email
+        credentials_ref (str): Reference from ``CredentialStore.store()``
+        episode_url (str): URL of the Spotify episode
+        episode_id (str): Spotify episode id, used as the cache key
+        force (bool): Extract again even if the transcription was extracted recently
+
+    Returns:
+        rq.job.Job: The queued job, or None if no queue is available
+    """
+    queue = get_queue()
+    if queue is None:
+        return None
+    job = queue.enqueue(
+        extract_job, username, credentials_ref, episode_url, episode_id, force,
+        job_timeout=JOB_TIMEOUT, result_ttl=RESULT_TTL, failure_ttl=RESULT_TTL,
+        meta={'username': username, 'episode_url': episode_url},
+    )
+    return job
+
+
+def fetch_job(job_id):
+    """Look up a queued job by id.
+
+    Returns:
+        rq.job.Job: The job, or None if it doesn't exist or expired
+    """
+    queue = get_queue()
+    if queue is None:
+        return None
+    return queue.fetch_job(job_id)
+
+
+def extract_job(username, credentials_ref, episode_url, episode_id, force=False):
+    """Extract a transcription inside the worker process.
+
+    Args:
+        username (str): Spotify username or email
+        credentials_ref (str): Reference from ``CredentialStore.store()``
+        episode_url (str): URL of the Spotify episode
+        episode_id (str): Spotify episode id, used as the cache key
+        force (bool): Extract again even if the transcription was extracted recently
+
+    Returns:
+        str: The transcription text, or None if none was found
+    """
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = BrowserPool(size=int(os.environ.get("BROWSER_POOL_SIZE", "4")))
+
+    redis_client = get_redis()
+    password = CredentialStore(redis_client).load(credentials_ref)
+    if not password:
+        raise RuntimeError('Spotify credentials expired. Please log in again.')
+
+    # Jobs queued for the same episode wait for one extraction
+    transcript_cache = TranscriptCache(redis_client)
+    with transcript_cache.single_flight(episode_id) as leader:
+        transcription = None if leader else transcript_cache.get(episode_id)
+        if not transcription:
+            success, transcription = run_async(extract_with_pool(_worker_pool, username, password, episode_url, episode_id, force))
+            if not success:
+                raise RuntimeError('Failed to log in to Spotify. Please try logging in again.')
+            if transcription:
+                transcript_cache.set(episode_id, transcription)
+    return transcription
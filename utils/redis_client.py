@@ -0,0 +1,24 @@
+import logging
+import os
+
+# Import Redis but handle import errors gracefully
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    logging.warning("redis not available, server-side features will be disabled")
+    REDIS_AVAILABLE = False
+
+_client = None
+
+
+def get_redis():
+    """Return the shared Redis client configured by ``REDIS_URL``.
+
+    Returns:
+        redis.Redis: The client, or None if Redis is unavailable or not configured
+    """
+    global _client
+    if _client is None and REDIS_AVAILABLE and os.environ.get("REDIS_URL"):
+        _client = redis.Redis.from_url(os.environ["REDIS_URL"])
+    return _client
@@ -1,102 +1,338 @@
+import asyncio
+import contextlib
+import html
 import logging
-import time
 import os
-import tempfile
+import re
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
+from urllib3.util import Retry
 
-# Import Playwright but handle import errors gracefully
+from utils.browser_pool import (
+    PLAYWRIGHT_AVAILABLE, SPOTIFY_AUTH_COOKIE, PlaywrightTimeoutError, is_authenticated, storage_state_is_fresh,
+    write_storage_state
+)
+
+# Import lxml but handle import errors gracefully
 try:
-    from playwright.sync_api import sync_playwright
-    PLAYWRIGHT_AVAILABLE = True
+    from lxml import etree
+    from lxml import html as lxml_html
+    from lxml.cssselect import CSSSelector
+    LXML_AVAILABLE = True
 except ImportError:
+    logging.warning("lxml not available, transcripts can't be parsed in request-based mode")
+    LXML_AVAILABLE = False
+
+# Prefer orjson for the large state blobs embedded in episode pages
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+if not PLAYWRIGHT_AVAILABLE:
     logging.warning("Playwright not available, falling back to manual methods")
-    PLAYWRIGHT_AVAILABLE = False
 
 
-class SpotifyBrowser:
-    """Class to handle Spotify web browser automation with fallbacks."""
+# Selectors for the transcript UI, in order of preference. They drive both
+# the browser waits and, compiled to XPath below, request-based parsing.
+TRANSCRIPT_BUTTON_SELECTORS = (
+    'button[aria-label="Show transcript"]',
+    'button:has-text("Show transcript")',
+    '[data-testid="transcript-button"]',
+    'button:has-text("Transcript")',
+)
+TRANSCRIPT_CONTAINER_SELECTORS = (
+    '[data-testid="transcript-container"]',
+    '.transcript-container',
+    '[aria-label="Transcript"]',
+    '.episode-transcript',
+)
+TRANSCRIPT_ITEM_SELECTORS = ('[data-testid="transcript-item"]', 'div > p', 'div')
+
+
+if LXML_AVAILABLE:
+    # Compiled once and reused for every episode page parsed in request-based mode
+    _CONTAINER_XPATHS = tuple(CSSSelector(selector) for selector in TRANSCRIPT_CONTAINER_SELECTORS)
+    _ITEM_XPATHS = tuple(CSSSelector(selector) for selector in TRANSCRIPT_ITEM_SELECTORS)
+    # Plain str results: orjson rejects lxml's str subclass that keeps the tree alive
+    _JSON_LD_XPATH = etree.XPath('//script[@type="application/ld+json"]/text()', smart_strings=False)
+
+
+# Transcript link in raw episode HTML, found without parsing the page so
+# the transcript can be fetched while the episode page is still being parsed
+_TRANSCRIPT_HREF_RE = re.compile(r'<a\b[^>]*\bhref="([^"]*transcript[^"]*)"')
+
+# Page state that server-rendered episode pages embed as JSON
+_NEXT_DATA_RE = re.compile(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+
+def _transcript_from_next_data(episode_html):
+    """Read the transcript out of the page's ``__NEXT_DATA__`` blob.
+
+    Walks ``props.pageProps`` for a ``transcript`` string or a
+    ``transcriptItems`` list, which already holds the lines in order.
+
+    Args:
+        episode_html (str): HTML of the episode page
+
+    Returns:
+        str: The transcription text, or None if the blob doesn't carry one
+    """
+    match = _NEXT_DATA_RE.search(episode_html)
+    if not match:
+        return None
+    try:
+        data = _json.loads(match.group(1))
+    except ValueError:
+        return None
+
+    props = data.get('props') if isinstance(data, dict) else None
+    pending = [props.get('pageProps')] if isinstance(props, dict) else []
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+
+        transcript = node.get('transcript')
+        if isinstance(transcript, str) and transcript.strip():
+            return transcript.strip()
+
+        items = node.get('transcriptItems')
+        if isinstance(items, list):
+            lines = [item.get('text', '') if isinstance(item, dict) else item for item in items]
+            lines = [line.strip() for line in lines if isinstance(line, str) and line.strip()]
+            if lines:
+                return "\n\n".join(lines)
+
+        pending.extend(reversed(list(node.values())))
+    return None
+
+
+def _find_transcript_container(tree):
+    """Return the first transcript container element in a parsed page, or None."""
+    for xpath in _CONTAINER_XPATHS:
+        found = xpath(tree)
+        if found:
+            return found[0]
+    return None
+
+
+def _transcript_from_container(transcript_container):
+    """Join the transcript items of a parsed container.
+
+    The item selectors are tried in order; joining several at once would
+    count a transcript item and its <p> twice.
+
+    Args:
+        transcript_container: lxml element found by ``_find_transcript_container()``
+
+    Returns:
+        str: The transcription text, or None if the container is empty
+    """
+    transcript_items = []
+    for xpath in _ITEM_XPATHS:
+        # Compiled CSS searches descendant-or-self; like querySelectorAll, only
+        # descendants count, so 'div' never matches a container div itself
+        transcript_items = [item for item in xpath(transcript_container) if item is not transcript_container]
+        if transcript_items:
+            break
+    
+    parts = [text for text in (item.text_content().strip() for item in transcript_items) if text]
+    transcript_text = "\n\n".join(parts)
+    
+    if not transcript_text:
+        # As a fallback, get all text from the container
+        transcript_text = transcript_container.text_content().strip()
     
-    def __init__(self, headless=True):
-        """Initialize the browser with Playwright if available.
+    return transcript_text or None
+
+# Headers sent with every request-based call
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+# Page-side check, polled after the transcript button is clicked, that the
+# transcript container has rendered an item or, for layouts without the item
+# test id, enough text. Only the container is searched, not the whole document.
+_TRANSCRIPT_READY_JS = """([containerSel, itemSel, minText]) => {
+    const container = document.querySelector(containerSel);
+    return !!container && (!!container.querySelector(itemSel) || container.innerText.trim().length > minText);
+}"""
+
+
+class _RequestsPage:
+    """Stand-in for a Playwright page when running in request-based mode.
+
+    Holds the HTML fetched for one episode so concurrent extractions don't
+    overwrite each other's state on the shared browser object.
+    """
+
+    def __init__(self):
+        self.episode_html = None
+        self.transcript_url = None
+        self.transcript_response = None
+
+    def close(self):
+        """Cancel a transcript prefetch that was never needed."""
+        if self.transcript_response is not None:
+            self.transcript_response.cancel()
+
+
+def _retrieve_prefetch_error(task):
+    """Mark a failed prefetch's exception as seen, since nobody may await it."""
+    if not task.cancelled() and task.exception() is not None:
+        logging.debug(f"Transcript prefetch failed: {str(task.exception())}")
+
+
+class AsyncSpotifyBrowser:
+    """Class to handle Spotify web browser automation with fallbacks.
+    
+    Works on a browser context checked out from a ``BrowserPool``; each
+    extraction opens its own page so several can run concurrently.
+    """
+    
+    # Keep-alive connection pool shared by every instance's requests session.
+    # Sessions stay per instance so each user's cookies are kept apart.
+    _http_adapter = None
+    
+    # Container text shorter than this is treated as not yet a transcript
+    _MIN_CONTAINER_TEXT = 20
+    
+    def __init__(self, context=None, max_pages=4, storage_state_path=None):
+        """Wrap a browser context, or fall back to requests without one.
         
         Args:
-            headless (bool): Whether to run the browser in headless mode.
+            context: Playwright BrowserContext from ``BrowserPool.checkout()``,
+                or None to use request-based mode.
+            max_pages (int): Maximum number of pages open at the same time.
+            storage_state_path (str): File to save the login to after a
+                successful ``login()``, so later contexts can skip it.
         """
-        self.headless = headless
-        self.playwright = None
-        self.browser = None
-        self.context = None
-        self.page = None
-        self.browser_mode = None
+        self.context = context
+        self.storage_state_path = storage_state_path
+        self.browser_mode = "playwright" if context is not None else "requests"
+        self._page_semaphore = asyncio.Semaphore(max_pages)
         
-        # Try to initialize browser, but don't raise if it fails - we'll use fallbacks
+        # Initialize session for request-based fallback
+        self.session = self._new_session()
+        
+        if self.browser_mode == "requests":
+            self._restore_session_cookies()
+    
+    @classmethod
+    def _new_session(cls):
+        """Create a requests session on the shared, retrying connection pool."""
+        if cls._http_adapter is None:
+            cls._http_adapter = HTTPAdapter(
+                pool_connections=8,
+                pool_maxsize=16,
+                max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+            )
+        session = requests.Session()
+        session.mount('https://', cls._http_adapter)
+        session.mount('http://', cls._http_adapter)
+        session.headers.update(DEFAULT_HEADERS)
+        return session
+    
+    def _restore_session_cookies(self):
+        """Load the cookies of a recent saved login into the requests session."""
+        if not self.storage_state_path or not storage_state_is_fresh(self.storage_state_path):
+            return
         try:
-            if PLAYWRIGHT_AVAILABLE:
-                self._initialize_browser()
-                self.browser_mode = "playwright"
-            else:
-                logging.info("Playwright not available, using request-based mode")
-                self.browser_mode = "requests"
+            with open(self.storage_state_path, 'rb') as f:
+                state = _json.loads(f.read())
+            for cookie in state.get('cookies', []):
+                self.session.cookies.set(
+                    cookie['name'], cookie['value'], domain=cookie['domain'], path=cookie.get('path', '/')
+                )
+            logging.debug(f"Restored login cookies from {self.storage_state_path}")
         except Exception as e:
-            logging.error(f"Browser initialization failed: {str(e)}")
-            logging.info("Falling back to request-based mode")
-            self.browser_mode = "requests"
-            
-        # Initialize session for request-based fallback
-        self.session = requests.Session()
+            logging.warning(f"Failed to restore login cookies: {str(e)}")
     
-    def _initialize_browser(self):
-        """Initialize the browser with Playwright."""
+    def _save_session_cookies(self):
+        """Save the requests session's cookies as a Playwright storage state.
+        
+        Using the same format as ``BrowserContext.storage_state()`` lets a
+        browser context restore a login made in request-based mode too.
+        """
+        if not self.storage_state_path:
+            return
+        state = {
+            'cookies': [
+                {
+                    'name': cookie.name,
+                    'value': cookie.value,
+                    'domain': cookie.domain,
+                    'path': cookie.path,
+                    'expires': cookie.expires if cookie.expires is not None else -1,
+                    'httpOnly': cookie.has_nonstandard_attr('HttpOnly'),
+                    'secure': cookie.secure,
+                    'sameSite': 'Lax',
+                }
+                for cookie in self.session.cookies
+            ],
+            'origins': [],
+        }
         try:
-            self.playwright = sync_playwright().start()
-            
-            # Try using Playwright's own downloaded browsers without specifying paths
-            logging.debug("Attempting to use Playwright's default browser")
-            
-            # Try with Chromium first
-            try:
-                self.browser = self.playwright.chromium.launch(headless=self.headless)
-                self.context = self.browser.new_context()
-                self.page = self.context.new_page()
-                logging.debug("Browser initialized successfully with Playwright's Chromium")
-                return
-            except Exception as chrome_err:
-                logging.warning(f"Failed with Chromium: {str(chrome_err)}")
-                
-            # Try with Firefox
-            try:
-                self.browser = self.playwright.firefox.launch(headless=self.headless)
-                self.context = self.browser.new_context()
-                self.page = self.context.new_page()
-                logging.debug("Browser initialized successfully with Playwright's Firefox")
-                return
-            except Exception as ff_err:
-                logging.warning(f"Failed with Firefox: {str(ff_err)}")
-                
-            # Try with WebKit as last resort
-            try:
-                self.browser = self.playwright.webkit.launch(headless=self.headless)
-                self.context = self.browser.new_context()
-                self.page = self.context.new_page()
-                logging.debug("Browser initialized successfully with Playwright's WebKit")
-                return
-            except Exception as webkit_err:
-                logging.warning(f"Failed with WebKit: {str(webkit_err)}")
-                
-            # If we get here, all browser types failed
-            raise Exception("All browser types failed to initialize")
-            
+            write_storage_state(self.storage_state_path, state)
+            logging.debug(f"Saved login cookies to {self.storage_state_path}")
         except Exception as e:
-            logging.error(f"Failed to initialize any browser: {str(e)}")
-            self.close()
-            raise
+            logging.warning(f"Failed to save login cookies: {str(e)}")
     
     def is_active(self):
         """Check if the browser is still active."""
-        return self.page is not None and self.browser is not None
+        return self.context is not None
+    
+    async def is_logged_in(self):
+        """Check whether the current context or session already holds a login.
+        
+        Returns:
+            bool: True if the Spotify auth cookie is present
+        """
+        if self.browser_mode == "requests":
+            return any(cookie.name == SPOTIFY_AUTH_COOKIE for cookie in self.session.cookies)
+        return await is_authenticated(self.context)
+    
+    async def get_cookies(self):
+        """Return the Spotify cookies of the current context or session.
+        
+        Returns:
+            dict: Cookie values by name
+        """
+        if self.browser_mode == "requests":
+            return {cookie.name: cookie.value for cookie in self.session.cookies}
+        cookies = await self.context.cookies('https://open.spotify.com')
+        return {cookie['name']: cookie['value'] for cookie in cookies}
+    
+    @contextlib.asynccontextmanager
+    async def new_page(self):
+        """Open a fresh page for one unit of work, bounded by ``max_pages``.
+        
+        Yields:
+            The Playwright page, or a ``_RequestsPage`` in request-based mode
+        """
+        async with self._page_semaphore:
+            if self.browser_mode == "requests":
+                page = _RequestsPage()
+                try:
+                    yield page
+                finally:
+                    page.close()
+                return
+            
+            page = await self.context.new_page()
+            try:
+                yield page
+            finally:
+                await page.close()
     
-    def login(self, username, password):
+    async def login(self, username, password):
         """Log in to Spotify web player.
         
         Args:
@@ -107,69 +343,83 @@ class SpotifyBrowser:
             bool: True if login was successful, False otherwise
         """
         if self.browser_mode == "requests":
-            return self._login_with_requests(username, password)
+            success = await self._login_with_requests(username, password)
+            if success:
+                self._save_session_cookies()
+            return success
         else:
-            return self._login_with_browser(username, password)
+            return await self._login_with_browser(username, password)
             
-    def _login_with_browser(self, username, password):
+    async def _login_with_browser(self, username, password):
         """Log in to Spotify using browser automation.
         
         Args:
             username (str): Spotify username or email
             password (str): Spotify password
             
+        Returns:
+            bool: True if login was successful, False otherwise
+        """
+        async with self.new_page() as page:
+            success = await self._fill_login_form(page, username, password)
+        
+        if success and self.storage_state_path:
+            try:
+                write_storage_state(self.storage_state_path, await self.context.storage_state())
+                logging.debug(f"Saved login state to {self.storage_state_path}")
+            except Exception as e:
+                logging.warning(f"Failed to save login state: {str(e)}")
+        return success
+    
+    async def _fill_login_form(self, page, username, password):
+        """Submit the Spotify login form on the given page.
+        
+        Args:
+            page: The Playwright page to log in with
+            username (str): Spotify username or email
+            password (str): Spotify password
+            
         Returns:
             bool: True if login was successful, False otherwise
         """
         try:
             # Navigate to Spotify login page
-            self.page.goto('https://accounts.spotify.com/login')
+            await page.goto('https://accounts.spotify.com/login')
             
             # Wait for the login form to appear
-            self.page.wait_for_selector('#login-username', timeout=30000)
+            await page.wait_for_selector('#login-username', timeout=30000)
             
             # Fill in username and password
-            self.page.fill('#login-username', username)
-            self.page.fill('#login-password', password)
+            await page.fill('#login-username', username)
+            await page.fill('#login-password', password)
             
             # Click login button
-            self.page.click('#login-button')
-            
-            # Check if login was successful by looking for typical elements on the logged-in page
-            # or error messages
+            await page.click('#login-button')
+            
+            # Check if login was successful by racing an error message against typical
+            # elements on the logged-in page; whichever appears first decides
+            error_locator = page.locator('.alert.alert-warning')
+            success_locator = page.locator(
+                'a[href="/collection"], '  # Navigation menu item
+                '[data-testid="spotify-logo"], '  # Spotify logo in web player
+                '[data-testid="home-active-icon"]'  # Home icon when logged in
+            )
             try:
-                # Wait for potential error message
-                error_selector = '.alert.alert-warning'
-                has_error = self.page.wait_for_selector(error_selector, timeout=5000, state='attached')
-                if has_error:
-                    error_text = self.page.text_content(error_selector)
+                await error_locator.or_(success_locator).first.wait_for(timeout=15000)
+                if await error_locator.count():
+                    error_text = await error_locator.first.text_content()
                     logging.error(f"Login error: {error_text}")
                     return False
-            except:
-                # No error found, continue
+                logging.debug("Login successful, found logged-in page element")
+                return True
+            except PlaywrightTimeoutError:
                 pass
             
-            # Wait for redirect to web player or home page after successful login
-            success_selectors = [
-                'a[href="/collection"]',  # Navigation menu item
-                '[data-testid="spotify-logo"]',  # Spotify logo in web player
-                '[data-testid="home-active-icon"]'  # Home icon when logged in
-            ]
-            
-            # Wait for any of the success indicators with a longer timeout
-            for selector in success_selectors:
-                try:
-                    if self.page.wait_for_selector(selector, timeout=10000, state='visible'):
-                        logging.debug("Login successful, found element: " + selector)
-                        return True
-                except:
-                    continue
-            
             # If we reach here, login might have failed or page structure changed
             logging.warning("Login result unclear, checking URL to verify")
             
             # Check if we're redirected to a Spotify URL that indicates success
-            current_url = self.page.url
+            current_url = page.url
             if 'open.spotify.com' in current_url or 'accounts.spotify.com/en/status' in current_url:
                 logging.debug(f"Login appears successful based on URL: {current_url}")
                 return True
@@ -181,7 +431,7 @@ class SpotifyBrowser:
             logging.error(f"Error during login with browser: {str(e)}")
             return False
             
-    def _login_with_requests(self, username, password):
+    async def _login_with_requests(self, username, password):
         """Log in to Spotify using requests library (fallback method).
         
         Args:
@@ -194,7 +444,7 @@ class SpotifyBrowser:
         try:
             # First, get the login page to obtain CSRF token
             login_url = 'https://accounts.spotify.com/login'
-            response = self.session.get(login_url)
+            response = await asyncio.to_thread(self.session.get, login_url)
             
             if response.status_code != 200:
                 logging.error(f"Failed to access login page: {response.status_code}")
@@ -209,14 +459,14 @@ class SpotifyBrowser:
             }
             
             headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
                 'Accept': 'application/json',
-                'Accept-Language': 'en-US,en;q=0.9',
                 'Content-Type': 'application/x-www-form-urlencoded',
                 'Referer': 'https://accounts.spotify.com/login'
             }
             
-            response = self.session.post(login_form_url, data=login_data, headers=headers, allow_redirects=True)
+            response = await asyncio.to_thread(
+                self.session.post, login_form_url, data=login_data, headers=headers, allow_redirects=True
+            )
             
             # Check if login was successful based on redirects or cookies
             if 'open.spotify.com' in response.url or any('spotify' in cookie.name and 'sp_dc' in cookie.name for cookie in self.session.cookies):
@@ -230,24 +480,26 @@ class SpotifyBrowser:
             logging.error(f"Error during login with requests: {str(e)}")
             return False
     
-    def navigate_to_episode(self, episode_url):
+    async def navigate_to_episode(self, page, episode_url):
         """Navigate to a Spotify episode page.
         
         Args:
+            page: Page obtained from ``new_page()``
             episode_url (str): URL of the Spotify episode
             
         Returns:
             bool: True if navigation was successful
         """
         if self.browser_mode == "requests":
-            return self._navigate_to_episode_with_requests(episode_url)
+            return await self._navigate_to_episode_with_requests(page, episode_url)
         else:
-            return self._navigate_to_episode_with_browser(episode_url)
+            return await self._navigate_to_episode_with_browser(page, episode_url)
             
-    def _navigate_to_episode_with_browser(self, episode_url):
+    async def _navigate_to_episode_with_browser(self, page, episode_url):
         """Navigate to a Spotify episode page using browser automation.
         
         Args:
+            page: The Playwright page to navigate
             episode_url (str): URL of the Spotify episode
             
         Returns:
@@ -255,10 +507,16 @@ class SpotifyBrowser:
         """
         try:
             # Navigate to the episode page
-            self.page.goto(episode_url)
+            await page.goto(episode_url)
+            
+            # A saved login that has expired sends us back to the login page
+            if 'accounts.spotify.com' in page.url or urlparse(page.url).path.endswith('/login'):
+                logging.warning(f"Redirected to login while opening episode: {page.url}")
+                await self._forget_login()
+                return False
             
             # Wait for the episode page to load
-            self.page.wait_for_selector('[data-testid="episode-page"]', timeout=30000)
+            await page.wait_for_selector('[data-testid="episode-page"]', timeout=30000)
             
             logging.debug(f"Successfully navigated to episode with browser: {episode_url}")
             return True
@@ -266,21 +524,40 @@ class SpotifyBrowser:
             logging.error(f"Failed to navigate to episode with browser {episode_url}: {str(e)}")
             return False
             
-    def _navigate_to_episode_with_requests(self, episode_url):
+    async def wait_ready(self, page):
+        """Wait until a freshly navigated episode page has parsed its DOM.
+        
+        Args:
+            page: Page obtained from ``new_page()``
+        """
+        if self.browser_mode == "requests":
+            # The whole HTML is already in hand
+            return
+        await page.wait_for_load_state("domcontentloaded")
+    
+    async def _forget_login(self):
+        """Drop the context's cookies and the saved login once it stops working."""
+        await self.context.clear_cookies()
+        if self.storage_state_path and os.path.exists(self.storage_state_path):
+            os.remove(self.storage_state_path)
+            
+    async def _navigate_to_episode_with_requests(self, page, episode_url):
         """Navigate to a Spotify episode page using requests library.
         
         Args:
+            page (_RequestsPage): Holder for the fetched episode HTML
             episode_url (str): URL of the Spotify episode
             
         Returns:
             bool: True if navigation was successful
         """
         try:
-            response = self.session.get(episode_url)
+            response = await asyncio.to_thread(self.session.get, episode_url)
             if response.status_code == 200:
                 logging.debug(f"Successfully navigated to episode with requests: {episode_url}")
                 # Store the response content for later extraction
-                self.episode_html = response.text
+                page.episode_html = response.text
+                self._prefetch_transcript(page)
                 return True
             else:
                 logging.error(f"Failed to navigate to episode with requests: Status code {response.status_code}")
@@ -289,9 +566,51 @@ class SpotifyBrowser:
             logging.error(f"Error navigating to episode with requests: {str(e)}")
             return False
     
-    def find_transcription_button(self):
+    def _prefetch_transcript(self, page):
+        """Start fetching the episode's transcript link, if it has one, in the background.
+        
+        The page is parsed in the meantime; the response is only awaited if
+        the episode HTML turns out not to contain the transcript itself.
+        
+        Args:
+            page (_RequestsPage): Holder with the fetched episode HTML
+        """
+        match = _TRANSCRIPT_HREF_RE.search(page.episode_html)
+        if not match:
+            return
+        transcript_url = html.unescape(match.group(1))
+        if not transcript_url.startswith('http'):
+            transcript_url = 'https://open.spotify.com' + transcript_url
+        page.transcript_url = transcript_url
+        page.transcript_response = asyncio.ensure_future(asyncio.to_thread(self.session.get, transcript_url))
+        page.transcript_response.add_done_callback(_retrieve_prefetch_error)
+    
+    async def _wait_for_any_selector(self, page, selectors, timeout=5000, state='visible'):
+        """Wait for whichever of several selectors matches first.
+        
+        All candidates are joined into one selector list, so the wait ends as
+        soon as any of them appears instead of timing out on each in turn.
+        
+        Args:
+            page: The Playwright page to search
+            selectors (list): Candidate selectors
+            timeout (int): Timeout in ms for the combined wait
+            state (str): Element state to wait for
+            
+        Returns:
+            ElementHandle: The first matching element, or None if nothing matched
+        """
+        try:
+            return await page.wait_for_selector(', '.join(selectors), timeout=timeout, state=state)
+        except PlaywrightTimeoutError:
+            return None
+    
+    async def find_transcription_button(self, page):
         """Find and click the transcription button for an episode.
         
+        Args:
+            page: Page obtained from ``new_page()``
+            
         Returns:
             bool: True if the transcription was found and clicked
         """
@@ -300,35 +619,41 @@ class SpotifyBrowser:
             # We'll extract the transcript directly from the page
             return True
         else:
-            return self._find_transcription_button_with_browser()
+            return await self._find_transcription_button_with_browser(page)
             
-    def _find_transcription_button_with_browser(self):
+    async def _find_transcription_button_with_browser(self, page):
         """Find and click the transcription button using browser automation.
         
+        Args:
+            page: The Playwright page showing the episode
+            
         Returns:
             bool: True if the transcription was found and clicked
         """
         try:
-            # Look for the transcription button (may vary based on Spotify's UI)
-            transcription_selectors = [
-                'button[aria-label="Show transcript"]',
-                'button:has-text("Show transcript")',
-                '[data-testid="transcript-button"]',
-                'button:has-text("Transcript")'
-            ]
-            
-            # Try each selector
-            for selector in transcription_selectors:
+            # Wait for whichever button variant shows up first; the label
+            # may vary based on Spotify's UI
+            button = await self._wait_for_any_selector(page, TRANSCRIPT_BUTTON_SELECTORS)
+            if button:
+                await button.click()
+                logging.debug("Found and clicked transcription button")
+                
+                # Wait for the transcript to render instead of sleeping
                 try:
-                    if self.page.wait_for_selector(selector, timeout=5000, state='visible'):
-                        self.page.click(selector)
-                        logging.debug(f"Found and clicked transcription button with selector: {selector}")
-                        
-                        # Wait for transcript to load
-                        time.sleep(2)
-                        return True
-                except:
-                    continue
+                    await page.wait_for_function(
+                        _TRANSCRIPT_READY_JS,
+                        arg=[
+                            ', '.join(TRANSCRIPT_CONTAINER_SELECTORS),
+                            TRANSCRIPT_ITEM_SELECTORS[0],
+                            self._MIN_CONTAINER_TEXT,
+                        ],
+                        timeout=8000
+                    )
+                except PlaywrightTimeoutError:
+                    # Transcript may use a different layout; the extraction
+                    # step still waits for the container on its own
+                    logging.debug("Transcript did not appear after clicking the button")
+                return True
             
             logging.warning("Could not find transcription button with browser")
             return False
@@ -336,66 +661,55 @@ class SpotifyBrowser:
             logging.error(f"Error finding transcription button with browser: {str(e)}")
             return False
     
-    def extract_transcription_text(self):
+    async def extract_transcription_text(self, page):
         """Extract the transcription text from the currently open transcript.
         
+        Args:
+            page: Page obtained from ``new_page()``
+            
         Returns:
             str: The extracted transcription text, or None if not found
         """
         if self.browser_mode == "requests":
-            return self._extract_transcription_text_with_requests()
+            return await self._extract_transcription_text_with_requests(page)
         else:
-            return self._extract_transcription_text_with_browser()
+            return await self._extract_transcription_text_with_browser(page)
             
-    def _extract_transcription_text_with_browser(self):
+    async def _extract_transcription_text_with_browser(self, page):
         """Extract the transcription text using browser automation.
         
+        Args:
+            page: The Playwright page showing the transcript
+            
         Returns:
             str: The extracted transcription text, or None if not found
         """
         try:
             # Wait for transcript container to be visible
-            transcript_selectors = [
-                '[data-testid="transcript-container"]',
-                '.transcript-container',
-                '[aria-label="Transcript"]',
-                '.episode-transcript'
-            ]
-            
-            transcript_container = None
-            for selector in transcript_selectors:
-                try:
-                    element = self.page.wait_for_selector(selector, timeout=5000)
-                    if element:
-                        transcript_container = element
-                        break
-                except:
-                    continue
+            transcript_container = await self._wait_for_any_selector(page, TRANSCRIPT_CONTAINER_SELECTORS)
             
             if not transcript_container:
                 logging.warning("Could not find transcript container with browser")
                 return None
             
-            # Extract text from all transcript items
-            transcript_items = self.page.query_selector_all('[data-testid="transcript-item"]')
-            
-            # If specific item selector didn't work, try more generic selectors
-            if not transcript_items or len(transcript_items) == 0:
-                transcript_items = transcript_container.query_selector_all('div > p')
-            
-            if not transcript_items or len(transcript_items) == 0:
-                transcript_items = transcript_container.query_selector_all('div')
-            
-            # Build the full transcript text
-            transcript_text = ""
-            for item in transcript_items:
-                text = item.inner_text()
-                if text and len(text.strip()) > 0:
-                    transcript_text += text.strip() + "\n\n"
+            # The container's innerText is already the transcript in reading
+            # order, so one call usually suffices and survives testid changes
+            container_text = (await transcript_container.inner_text() or "").strip()
+            if len(container_text) > self._MIN_CONTAINER_TEXT:
+                return container_text
+            
+            # Otherwise parse one snapshot of the rendered page offline
+            # instead of querying the items over the browser connection
+            transcript_text = None
+            if LXML_AVAILABLE:
+                tree = lxml_html.fromstring(await page.content())
+                parsed_container = _find_transcript_container(tree)
+                if parsed_container is not None:
+                    transcript_text = _transcript_from_container(parsed_container)
             
             if not transcript_text:
-                # As a fallback, get all text from the container
-                transcript_text = transcript_container.inner_text()
+                # As a fallback, use whatever text the container had
+                transcript_text = container_text
             
             return transcript_text.strip() if transcript_text else None
         
@@ -403,90 +717,59 @@ class SpotifyBrowser:
             logging.error(f"Error extracting transcription text with browser: {str(e)}")
             return None
             
-    def _extract_transcription_text_with_requests(self):
+    async def _extract_transcription_text_with_requests(self, page):
         """Extract the transcription text using requests and HTML parsing.
         
+        Args:
+            page (_RequestsPage): Holder for the fetched episode HTML
+            
         Returns:
             str: The extracted transcription text, or None if not found
         """
         try:
-            from bs4 import BeautifulSoup
-            
-            if not hasattr(self, 'episode_html') or not self.episode_html:
+            if not page.episode_html:
                 logging.error("No episode HTML available for extraction")
                 return None
+            
+            # The embedded page state is cheaper to read than the DOM
+            transcript_text = _transcript_from_next_data(page.episode_html)
+            if transcript_text:
+                return transcript_text
+            
+            if not LXML_AVAILABLE:
+                logging.error("lxml is required to parse transcripts in request-based mode")
+                return None
                 
-            soup = BeautifulSoup(self.episode_html, 'html.parser')
+            tree = lxml_html.fromstring(page.episode_html)
             
             # Try to find transcript container or items
-            transcript_container = None
+            transcript_container = _find_transcript_container(tree)
             
-            # Look for different possible transcript container elements
-            for selector in ['[data-testid="transcript-container"]', '.transcript-container', 
-                            '[aria-label="Transcript"]', '.episode-transcript']:
-                container = soup.select_one(selector)
-                if container:
-                    transcript_container = container
-                    break
-            
-            if not transcript_container:
+            if transcript_container is None:
                 logging.warning("Could not find transcript container with requests")
-                # Check if we need to make another request to load the transcript
-                transcript_url = None
-                
-                # Look for transcript links or buttons
-                transcript_links = soup.select('a[href*="transcript"]')
-                if transcript_links:
-                    transcript_url = transcript_links[0].get('href')
-                    if not transcript_url.startswith('http'):
-                        transcript_url = 'https://open.spotify.com' + transcript_url
-                
-                if transcript_url:
-                    logging.info(f"Found transcript URL, fetching: {transcript_url}")
-                    response = self.session.get(transcript_url)
+                # The transcript link found while navigating has been
+                # fetching in the background since
+                if page.transcript_response is not None:
+                    logging.info(f"Found transcript URL, fetching: {page.transcript_url}")
+                    response = await page.transcript_response
                     if response.status_code == 200:
-                        soup = BeautifulSoup(response.text, 'html.parser')
+                        tree = lxml_html.fromstring(response.text)
                         # Try again to find transcript containers
-                        for selector in ['[data-testid="transcript-container"]', '.transcript-container', 
-                                        '[aria-label="Transcript"]', '.episode-transcript']:
-                            container = soup.select_one(selector)
-                            if container:
-                                transcript_container = container
-                                break
+                        transcript_container = _find_transcript_container(tree)
                                 
             # Extract text from the container
-            if transcript_container:
-                # Try to extract items from container
-                transcript_items = transcript_container.select('[data-testid="transcript-item"]')
-                
-                if not transcript_items:
-                    transcript_items = transcript_container.select('div > p')
-                    
-                if not transcript_items:
-                    transcript_items = transcript_container.select('div')
-                
-                transcript_text = ""
-                for item in transcript_items:
-                    text = item.get_text(strip=True)
-                    if text:
-                        transcript_text += text + "\n\n"
-                
-                if not transcript_text:
-                    # As a fallback, get all text from the container
-                    transcript_text = transcript_container.get_text(strip=True)
-                
-                return transcript_text.strip() if transcript_text else None
+            if transcript_container is not None:
+                return _transcript_from_container(transcript_container)
             
             # If we still don't have a transcript, try to find it in JSON data
-            script_tags = soup.select('script[type="application/ld+json"]')
-            for script in script_tags:
+            for script in _JSON_LD_XPATH(tree):
                 try:
-                    import json
-                    data = json.loads(script.string)
-                    if isinstance(data, dict) and 'transcript' in data:
-                        return data['transcript']
-                except:
-                    pass
+                    data = _json.loads(script)
+                except ValueError:
+                    # Not valid JSON; orjson and json both raise a ValueError subclass
+                    continue
+                if isinstance(data, dict) and 'transcript' in data:
+                    return data['transcript']
                     
             logging.warning("Could not extract transcript from the page")
             return None
@@ -495,20 +778,13 @@ class SpotifyBrowser:
             logging.error(f"Error extracting transcription text with requests: {str(e)}")
             return None
     
-    def close(self):
-        """Close the browser and clean up resources."""
+    async def close(self):
+        """Release the request session. The context belongs to the pool."""
         try:
-            if self.context:
-                self.context.close()
-            if self.browser:
-                self.browser.close()
-            if self.playwright:
-                self.playwright.stop()
-            
-            self.page = None
+            # Closing the session would also drop the shared adapter's
+            # keep-alive connections, so only forget this user's cookies
+            self.session.cookies.clear()
             self.context = None
-            self.browser = None
-            self.playwright = None
             
             logging.debug("Browser closed successfully")
         except Exception as e:
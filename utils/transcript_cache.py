@@ -0,0 +1,135 @@
+import contextlib
+import logging
+import uuid
+
+# Import zstandard but handle import errors gracefully
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Transcripts don't change once published, so keep them for a month
+TRANSCRIPT_TTL = 30 * 24 * 60 * 60
+
+# How long one extraction may hold the per-episode lock, and how long others wait
+LOCK_TIMEOUT = 120
+
+# Every zstd frame starts with these bytes, which plain UTF-8 text never does
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+class TranscriptCache:
+    """Redis cache of extracted transcriptions keyed by episode id.
+
+    Does nothing when no Redis client is configured.
+    """
+
+    def __init__(self, redis_client=None, ttl=TRANSCRIPT_TTL):
+        """Initialize the cache.
+
+        Args:
+            redis_client: Redis client to store transcripts in, or None.
+            ttl (int): Seconds to keep each transcript.
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+
+    def get(self, episode_id):
+        """Return the cached transcription for an episode.
+
+        Args:
+            episode_id (str): Spotify episode id
+
+        Returns:
+            str: The transcription, or None on a miss
+        """
+        if self.redis is None:
+            return None
+        try:
+            value = self.redis.get(f"transcript:{episode_id}")
+            if value is None:
+                return None
+            if value.startswith(_ZSTD_MAGIC) and ZSTD_AVAILABLE:
+                value = zstandard.ZstdDecompressor().decompress(value)
+            return value.decode('utf-8')
+        except Exception as e:
+            logging.error(f"Error reading cached transcription: {str(e)}")
+            return None
+
+    def set(self, episode_id, transcription):
+        """Store a transcription, compressed with zstd when available.
+
+        Args:
+            episode_id (str): Spotify episode id
+            transcription (str): The transcription text
+        """
+        if self.redis is None:
+            return
+        try:
+            value = transcription.encode('utf-8')
+            if ZSTD_AVAILABLE:
+                value = zstandard.ZstdCompressor().compress(value)
+            self.redis.setex(f"transcript:{episode_id}", self.ttl, value)
+        except Exception as e:
+            logging.error(f"Error caching transcription: {str(e)}")
+
+    @contextlib.contextmanager
+    def single_flight(self, episode_id):
+        """Make sure only one caller at a time extracts a given episode.
+
+        The first caller takes the lock and yields True; it should extract and
+        ``set()`` the transcription. Callers that arrive meanwhile block until
+        the first one finishes, then yield False and should read the cache
+        (extracting themselves only if that still misses).
+
+        Args:
+            episode_id (str): Spotify episode id
+
+        Yields:
+            bool: True if this caller holds the lock
+        """
+        if self.redis is None:
+            yield True
+            return
+
+        lock_key = f"lock:ep:{episode_id}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.redis.set(lock_key, token, nx=True, ex=LOCK_TIMEOUT)
+            holder = None if acquired else self.redis.get(lock_key)
+        except Exception as e:
+            logging.error(f"Error taking extraction lock: {str(e)}")
+            yield True
+            return
+
+        if not acquired:
+            # Each flight signals on its own key, named after the holder's token,
+            # so a wake-up left over from an earlier flight is never mistaken
+            # for this one finishing. No holder means it has just finished.
+            if holder is not None:
+                result_key = f"result:{episode_id}:{holder.decode('utf-8')}"
+                try:
+                    # Wait for the lock holder, then pass the wake-up on to the next waiter
+                    if self.redis.blpop(result_key, LOCK_TIMEOUT):
+                        self.redis.lpush(result_key, 'done')
+                        self.redis.expire(result_key, LOCK_TIMEOUT)
+                except Exception as e:
+                    logging.error(f"Error waiting for in-flight extraction: {str(e)}")
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            try:
+                # Wake up waiters, then release the lock if it's still ours
+                result_key = f"result:{episode_id}:{token}"
+                pipe = self.redis.pipeline()
+                pipe.lpush(result_key, 'done')
+                pipe.expire(result_key, LOCK_TIMEOUT)
+                pipe.execute()
+                if self.redis.get(lock_key) == token.encode('utf-8'):
+                    self.redis.delete(lock_key)
+            except Exception as e:
+                logging.error(f"Error releasing extraction lock: {str(e)}")
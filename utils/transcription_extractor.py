@@ -1,43 +1,216 @@
+import asyncio
 import logging
 import time
+from collections import OrderedDict
 
-def extract_transcription(spotify_browser, episode_url):
+from utils import httpx_extractor
+from utils.browser_pool import credential_key, fresh_storage_state, storage_state_path, write_storage_state
+from utils.spotify_browser import AsyncSpotifyBrowser
+
+# Transcriptions extracted recently in this process, by episode URL, so a
+# retry or repeat request skips the network and parsing entirely
+RECENT_TTL = 600
+RECENT_MAX_SIZE = 1024
+_recent = OrderedDict()
+
+
+def _get_recent(episode_url):
+    """Return a transcription extracted within ``RECENT_TTL`` seconds, or None."""
+    entry = _recent.get(episode_url)
+    if entry is None:
+        return None
+    extracted_at, transcription = entry
+    if time.monotonic() - extracted_at > RECENT_TTL:
+        del _recent[episode_url]
+        return None
+    _recent.move_to_end(episode_url)
+    return transcription
+
+
+def _remember(episode_url, transcription):
+    """Keep a transcription, evicting the least recently used beyond the limit."""
+    _recent[episode_url] = (time.monotonic(), transcription)
+    _recent.move_to_end(episode_url)
+    while len(_recent) > RECENT_MAX_SIZE:
+        _recent.popitem(last=False)
+
+
+async def extract_transcription(spotify_browser, episode_url, episode_id, force=False):
     """
     Extract transcription from a Spotify episode.
-    
+
     Args:
-        spotify_browser: An initialized SpotifyBrowser instance with active login
+        spotify_browser: A started AsyncSpotifyBrowser instance with active login
         episode_url: URL of the Spotify episode to extract transcription from
-        
+        episode_id: Spotify episode id from the URL
+        force: Extract again even if the transcription was extracted recently
+
     Returns:
         str: The transcription text if found, None otherwise
     """
+    if force:
+        _recent.pop(episode_url, None)
+    else:
+        transcription = _get_recent(episode_url)
+        if transcription:
+            return transcription
+
+    transcription = await _extract_transcription(spotify_browser, episode_url, episode_id)
+    if transcription:
+        _remember(episode_url, transcription)
+    return transcription
+
+
+async def _extract_transcription(spotify_browser, episode_url, episode_id):
+    """Run the extraction pipeline for ``extract_transcription()``, uncached."""
     try:
-        # Navigate to the episode page
-        if not spotify_browser.navigate_to_episode(episode_url):
-            logging.error(f"Failed to navigate to episode: {episode_url}")
-            return None
-        
-        # Give the page some time to fully load
-        time.sleep(3)
-        
-        # Find and click on the transcription button
-        if not spotify_browser.find_transcription_button():
-            logging.warning(f"No transcription button found for episode: {episode_url}")
-            return None
-        
-        # Allow transcript to load
-        time.sleep(2)
-        
-        # Extract the transcription text
-        transcription = spotify_browser.extract_transcription_text()
-        
+        # Try the plain HTTP fast path before driving the browser
+        transcription = await httpx_extractor.try_httpx(episode_id, await spotify_browser.get_cookies())
+        if transcription:
+            return transcription
+
+        # Each extraction gets its own page so concurrent calls don't interfere
+        async with spotify_browser.new_page() as page:
+            # Navigate to the episode page
+            if not await spotify_browser.navigate_to_episode(page, episode_url):
+                logging.error(f"Failed to navigate to episode: {episode_url}")
+                return None
+
+            # Wait for the page to be ready instead of a fixed delay
+            await spotify_browser.wait_ready(page)
+
+            # Find and click on the transcription button
+            if not await spotify_browser.find_transcription_button(page):
+                logging.warning(f"No transcription button found for episode: {episode_url}")
+                return None
+
+            # Extract the transcription text; the click above already waited
+            # for the transcript items to render
+            transcription = await spotify_browser.extract_transcription_text(page)
+
         if not transcription:
             logging.warning(f"No transcription text found for episode: {episode_url}")
             return None
-        
+
         return transcription
-        
+
     except Exception as e:
         logging.error(f"Error extracting transcription: {str(e)}")
         return None
+
+
+async def login_with_pool(pool, username, password):
+    """Log in with a pooled context, reusing an existing login if possible.
+
+    Args:
+        pool: BrowserPool to check a context out of
+        username: Spotify username or email
+        password: Spotify password
+
+    Returns:
+        bool: True if the credentials are logged in
+    """
+    key = credential_key(username, password)
+    async with pool.checkout(key) as context:
+        spotify_browser = AsyncSpotifyBrowser(context, storage_state_path=storage_state_path(key))
+        try:
+            if await spotify_browser.is_logged_in():
+                return True
+            return await spotify_browser.login(username, password)
+        finally:
+            await spotify_browser.close()
+
+
+async def extract_with_pool(pool, username, password, episode_url, episode_id, force=False):
+    """Extract a transcription with a pooled, logged-in context.
+
+    Args:
+        pool: BrowserPool to check a context out of
+        username: Spotify username or email
+        password: Spotify password
+        episode_url: URL of the Spotify episode to extract transcription from
+        episode_id: Spotify episode id from the URL
+        force: Extract again even if the transcription was extracted recently
+
+    Returns:
+        tuple: (logged_in, transcription) where transcription may be None
+    """
+    key = credential_key(username, password)
+    async with pool.checkout(key) as context:
+        spotify_browser = AsyncSpotifyBrowser(context, storage_state_path=storage_state_path(key))
+        try:
+            if not await spotify_browser.is_logged_in():
+                if not await spotify_browser.login(username, password):
+                    return False, None
+            transcription = await extract_transcription(spotify_browser, episode_url, episode_id, force)
+
+            # The restored login expired mid-request: log in again and retry once
+            if transcription is None and not await spotify_browser.is_logged_in():
+                if not await spotify_browser.login(username, password):
+                    return False, None
+                transcription = await extract_transcription(spotify_browser, episode_url, episode_id, force)
+            return True, transcription
+        finally:
+            await spotify_browser.close()
+
+
+async def extract_batch_with_pool(pool, username, password, episodes, max_concurrency=5, force=False):
+    """Extract several transcriptions concurrently for one set of credentials.
+
+    The credentials are logged in once; each episode then gets its own
+    pooled context, restored from that saved login, so page state and
+    network waits of concurrent extractions never interfere. At most
+    max_concurrency extractions run at the same time.
+
+    Args:
+        pool: BrowserPool to check contexts out of
+        username: Spotify username or email
+        password: Spotify password
+        episodes: Spotify episode ids by the URLs to extract
+        max_concurrency: Maximum number of extractions running at the same time
+        force: Extract again even if a transcription was extracted recently
+
+    Returns:
+        tuple: (logged_in, results) where results maps each URL to its
+            transcription, None, or the exception raised while extracting
+    """
+    key = credential_key(username, password)
+    async with pool.checkout(key) as context:
+        spotify_browser = AsyncSpotifyBrowser(
+            context, max_pages=max_concurrency, storage_state_path=storage_state_path(key)
+        )
+        try:
+            if not await spotify_browser.is_logged_in():
+                if not await spotify_browser.login(username, password):
+                    return False, {}
+
+            # Request-based mode has no saved login to restore into other
+            # contexts, so every episode shares this session instead
+            if context is None:
+                transcriptions = await asyncio.gather(
+                    *(extract_transcription(spotify_browser, url, episode_id, force) for url, episode_id in episodes.items()),
+                    return_exceptions=True
+                )
+                return True, dict(zip(episodes, transcriptions))
+
+            # Make sure the contexts below restore this login instead of each
+            # going through the login form
+            if not fresh_storage_state(key):
+                write_storage_state(storage_state_path(key), await context.storage_state())
+        finally:
+            await spotify_browser.close()
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def extract_one(episode_url, episode_id):
+        async with semaphore:
+            logged_in, transcription = await extract_with_pool(pool, username, password, episode_url, episode_id, force)
+            if not logged_in:
+                raise RuntimeError('Failed to login to Spotify')
+            return transcription
+
+    transcriptions = await asyncio.gather(
+        *(extract_one(url, episode_id) for url, episode_id in episodes.items()),
+        return_exceptions=True
+    )
+    return True, dict(zip(episodes, transcriptions))